@@ -1,8 +1,16 @@
 import sqlite3
+import csv
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
 import os
 import time
+import functools
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 '''
 
@@ -10,6 +18,65 @@ Loading .csv files
 
 '''
 
+#Positions of relevant columns in a 107 log
+LOG_COLUMNS = [0,1,2,3,5,7,8,9,12,13,18]
+
+def _read_107_columns(filepath, float32 = False):
+    '''
+    Reads relevant columns of a 107 log with the PyArrow CSV reader
+    The two most recently read logs are cached, which only helps repeated direct load_csv() or load_db() calls on the same unchanged file
+    (the two loaders read different float precisions, so they do not share entries; to_107db() worker processes parse without the cache)
+
+    Parameters
+    ----------
+    filepath : str
+        Filepath of individual, complete 107 log (.csv file)
+    float32 : bool, optional
+        Read sensor columns as 32-bit instead of 64-bit floats. The default is False.
+
+    Returns
+    -------
+    log_107 : DataFrame
+        Relevant columns of the 107 log, in the order they appear in the file, named 'column<position in file>'
+        Shared with the cache: reshape into a new DataFrame rather than modifying in place
+
+    '''
+    #Key the cache on modification time and size so edited or rewritten files are read again
+    stat = os.stat(filepath)
+    return _cached_read_107_columns(os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size, float32)
+
+
+@functools.lru_cache(maxsize = 2)
+def _cached_read_107_columns(filepath, mtime, size, float32):
+    '''
+    Cached reader behind _read_107_columns(); mtime and size are only used as part of the cache key
+    '''
+    return _parse_107_columns(filepath, float32)
+
+
+def _parse_107_columns(filepath, float32 = False, use_threads = True):
+    '''
+    Parses relevant columns of a 107 log, without caching. See _read_107_columns()
+    use_threads=False parses with a single PyArrow thread
+    '''
+    #Select columns by position: header names may repeat, so name every column by its position instead
+    with open(filepath, newline='') as f:
+        header = next(csv.reader(f))
+    positional_names = ['column{}'.format(i) for i in range(len(header))]
+    names = [positional_names[i] for i in LOG_COLUMNS]
+
+    #Date/time is parsed with a fixed format, notes are read as categories (only a few distinct notes repeat)
+    #Sensor readings may be read as 32-bit floats, hours after start is always read as 64-bit floats
+    column_types = {name:(pa.float32() if float32 else pa.float64()) for name in names[3:]}
+    column_types[names[2]] = pa.float64()
+    column_types[names[0]] = pa.timestamp('s')
+    column_types[names[1]] = pa.dictionary(pa.int32(), pa.string())
+
+    #Skip the header and the two rows below it
+    table = pv.read_csv(filepath, read_options = pv.ReadOptions(column_names = positional_names, skip_rows = 3, use_threads = use_threads), convert_options = pv.ConvertOptions(include_columns = names, column_types = column_types, timestamp_parsers = ['%m/%d/%Y %H:%M:%S']))
+    return table.to_pandas(split_blocks = True, self_destruct = True)
+
+
 def load_csv(filepath):
     '''
     Loads relevant columns of a 107 log
@@ -26,8 +93,8 @@ def load_csv(filepath):
 
     '''
     #Load relevant columns 107 log
-    log_filepath = r'{}'.format(filepath)
-    log_107 = pd.read_csv(log_filepath, usecols = [0,1,2,3,5,7,8,9,12,13,18], skiprows = [1,2], na_filter=False)
+    #Sensor readings are read as 32-bit floats: still finer than the sensors resolve, and half the memory scanned when splitting
+    log_107 = _read_107_columns(filepath, float32 = True)
 
     #Reorder and rename columns
     column_order = [0,2,3,4,6,7,5,10,8,9,1]
@@ -35,12 +102,72 @@ def load_csv(filepath):
     log_107 = log_107[[log_107.columns[i] for i in column_order]]
     log_107.columns = column_names
 
-    #Convert type of "Date/Time" column from string to datetime
-    log_107['Date/Time'] = pd.to_datetime(log_107['Date/Time'], format = '%m/%d/%Y %H:%M:%S')
-
     return log_107
 
 
+def _notes_contain(notes, *phrases):
+    '''
+    Checks which rows of a Notes column contain any of the given phrases
+    The phrases are only searched for in the distinct notes, which are then looked up for each row by category code
+
+    Parameters
+    ----------
+    notes : Series
+        Notes column of a 107 log
+    *phrases : str
+        Phrases to search for
+
+    Returns
+    -------
+    found : ndarray
+        Boolean array, True for rows containing at least one of the phrases
+
+    '''
+    notes = notes.astype('category')
+    categories = notes.cat.categories
+    found = np.zeros(len(categories)+1, dtype=bool) #Last entry stays False for missing notes (code -1)
+    for phrase in phrases:
+        found[:-1] |= categories.str.contains(phrase, regex=False)
+    return found[notes.cat.codes.to_numpy()]
+
+
+def _segment_counts(booleans, starts, stops):
+    '''
+    Counts True values of a boolean array between each pair of start and stop indicies in a single pass
+
+    Parameters
+    ----------
+    booleans : ndarray
+        Boolean array over the entire log
+    starts, stops : ndarray
+        Start (inclusive) and stop (exclusive) indicies of each phase
+
+    Returns
+    -------
+    counts : ndarray
+        Number of True values in booleans[starts[i]:stops[i]] for each phase
+
+    '''
+    cumulative = np.concatenate(([0], np.cumsum(booleans)))
+    return cumulative[stops]-cumulative[starts]
+
+
+def _check_regens(current, starts, stops, durations):
+    '''
+    Checks if the magnet turns on (current reaches above 15 A) and if the magnet cycle lasts appropriate length of time (between 3 to 5 hours)
+    Returns a boolean array marking which regen phases to keep
+    '''
+    return (_segment_counts(current>15, starts, stops)>0) & (3<durations) & (durations<5)
+
+
+def _check_regs(current, starts, stops):
+    '''
+    Checks if magnet current is reasonable (above 0.1 A and below 2 A)
+    Returns a boolean array marking which reg phases to keep
+    '''
+    return (_segment_counts(~(current<0.1), starts, stops)>0) & (_segment_counts(current>2, starts, stops)==0)
+
+
 def split_csv(log):
     '''
     Splits a reformatted 107 log into separate logs for separate phases (i.e. cooldown, regen, reg, and warmup phases)
@@ -70,60 +197,68 @@ def split_csv(log):
 
 
     #Determine ADR cycle start and completion via Notes column
-    all_booleans = log['Notes'].map(lambda x:'Start Mag Cycle' in x or 'Mag Cycle complete' in x or 'Mag Cycle Canceled' in x).to_list()
+    regen_booleans = _notes_contain(log['Notes'], 'Start Mag Cycle')
+    reg_booleans = _notes_contain(log['Notes'], 'Mag Cycle complete', 'Mag Cycle Canceled')
+    all_booleans = regen_booleans | reg_booleans
     all_booleans[0] = True
     all_booleans[-1] = True
-    #Create list of indicies where run starts, run completes, ADR cycle starts, and ADR cycle completes
-    all_indicies = log.index[all_booleans].to_list()
+    #Create sorted array of indicies where run starts, run completes, ADR cycle starts, and ADR cycle completes
+    all_indicies = log.index[all_booleans].to_numpy()
+
+    #Extract magnet current and timestamps as arrays for checking phases
+    current = log['Current'].to_numpy()
+    times = log['Date/Time'].to_numpy()
+    #Hours elapsed since the start of the log, used to reset "Hours from Start" for each phase
+    hours = (times-times[0])/np.timedelta64(1,'h')
 
 
     #Create a dictionary storing cooldown and warmup logs
 
     coolwarmfiles = {} #Initialize dictionary
-    coolwarmfiles['cooldown']=log.iloc[all_indicies[0]:all_indicies[1],:]
-    coolwarmfiles['warmup']=log.iloc[all_indicies[-2]:all_indicies[-1],:]
-    coolwarmfiles['cooldown']['Hours'] = (coolwarmfiles['cooldown']['Date/Time']-coolwarmfiles['cooldown'].iloc[0,0]).dt.total_seconds()/3600
-    coolwarmfiles['warmup']['Hours'] = (coolwarmfiles['warmup']['Date/Time']-coolwarmfiles['warmup'].iloc[0,0]).dt.total_seconds()/3600
+    #Copy the slices so that resetting "Hours from Start" does not write to a view of the log
+    coolwarmfiles['cooldown']=log.iloc[all_indicies[0]:all_indicies[1],:].copy()
+    coolwarmfiles['warmup']=log.iloc[all_indicies[-2]:all_indicies[-1],:].copy()
+    coolwarmfiles['cooldown']['Hours'] = hours[all_indicies[0]:all_indicies[1]]-hours[all_indicies[0]]
+    coolwarmfiles['warmup']['Hours'] = hours[all_indicies[-2]:all_indicies[-1]]-hours[all_indicies[-2]]
 
 
     #Create a dictionary storing regen logs
 
-    #Determine ADR cycle start via Notes column
-    regen_booleans = log['Notes'].map(lambda x:'Start Mag Cycle' in x).to_list()
     #Create list of indicies where ADR cycle starts
-    regen_indicies = log.index[regen_booleans].to_list()
+    regen_indicies = log.index[regen_booleans].to_numpy()
+    #Find the next phase boundary after each ADR cycle start
+    regen_stops = all_indicies[np.searchsorted(all_indicies, regen_indicies, side='right')]
     regenfiles = {} #Initialize dictionary
     regen_count = 0 #Counter variable for naming dictionary keys
-    for x in range(len(regen_indicies)):
-        #Check if magnet turns on (current reaches above 15 A) and if magnet cycle lasts appropriate length of time (between 3 to 5 hours)
-        if log.iloc[regen_indicies[x]:all_indicies[all_indicies.index(regen_indicies[x])+1],8].map(lambda x:x>15).any() and \
-        3<((log.iloc[all_indicies[all_indicies.index(regen_indicies[x])+1],0]-log.iloc[regen_indicies[x],0]).total_seconds()/3600)<5:
-            regen_count += 1
-            #Add regen log to dictionary and reset index
-            regenfiles['regen{}'.format(regen_count)]=log.iloc[regen_indicies[x]:all_indicies[all_indicies.index(regen_indicies[x])+1],:].reset_index(drop=True)
-            #Reset "Hours from Start" column
-            regenfiles['regen{}'.format(regen_count)]["Hours"] = (regenfiles['regen{}'.format(regen_count)]['Date/Time']-regenfiles['regen{}'.format(regen_count)].iloc[0,0]).dt.total_seconds()/3600
+    #Check all regen phases at once, then extract the ones that pass
+    regen_kept = _check_regens(current, regen_indicies, regen_stops, hours[regen_stops]-hours[regen_indicies])
+    for start, stop in zip(regen_indicies[regen_kept], regen_stops[regen_kept]):
+        regen_count += 1
+        #Add regen log to dictionary and reset index
+        regenfiles['regen{}'.format(regen_count)]=log.iloc[start:stop,:].reset_index(drop=True)
+        #Reset "Hours from Start" column
+        regenfiles['regen{}'.format(regen_count)]["Hours"] = hours[start:stop]-hours[start]
 
 
     #Create a dictionary storing reg logs
 
-    #Determine ADR cycle completion via Notes column
-    reg_booleans = log['Notes'].map(lambda x:'Mag Cycle complete' in x or 'Mag Cycle Canceled' in x).to_list()
     #Create list of indicies where ADR cycle completes
-    reg_indicies = log.index[reg_booleans].to_list()
+    reg_indicies = log.index[reg_booleans].to_numpy()
+    #Find the next phase boundary after each ADR cycle completion
+    reg_stops = all_indicies[np.searchsorted(all_indicies, reg_indicies, side='right')]
     regfiles = {} #Initialize dictionary
     reg_count = 0 #Counter variable for naming dictionary keys
-    for x in range(len(reg_indicies)):
-        #Check if magnet current is reasonable (above 0.1 A and below 2 A)
-        if not log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],8].map(lambda x:x<0.1).all() and \
-        not log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],8].map(lambda x:x>2).any():
-            reg_count += 1
-            #Add reg log to dictionary and reset index
-            regfiles['reg{}'.format(reg_count)]=log.iloc[reg_indicies[x]:all_indicies[all_indicies.index(reg_indicies[x])+1],:].reset_index(drop=True)
-            #Reset "Hours from Start" column
-            regfiles['reg{}'.format(reg_count)]["Hours"] = (regfiles['reg{}'.format(reg_count)]['Date/Time']-regfiles['reg{}'.format(reg_count)].iloc[0,0]).dt.total_seconds()/3600
-            #Replace 0 values in "50 mK FAA" column with NaN
-            regfiles['reg{}'.format(reg_count)]['50mK'].replace(0,np.nan,inplace=True)
+    #Check all reg phases at once, then extract the ones that pass
+    reg_kept = _check_regs(current, reg_indicies, reg_stops)
+    for start, stop in zip(reg_indicies[reg_kept], reg_stops[reg_kept]):
+        reg_count += 1
+        #Add reg log to dictionary and reset index
+        regfiles['reg{}'.format(reg_count)]=log.iloc[start:stop,:].reset_index(drop=True)
+        #Reset "Hours from Start" column
+        regfiles['reg{}'.format(reg_count)]["Hours"] = hours[start:stop]-hours[start]
+        #Replace 0 values in "50 mK FAA" column with NaN
+        temp_50mK = regfiles['reg{}'.format(reg_count)]['50mK'].to_numpy()
+        regfiles['reg{}'.format(reg_count)]['50mK'] = np.where(temp_50mK==0, np.nan, temp_50mK)
     #Filter warmup data from temperature holds
     regfiles = temphold_filter(regfiles)
 
@@ -148,10 +283,12 @@ def temphold_filter(regfiles):
     '''
     for key,reg in regfiles.items():
         #Remove parts of temperature regulation phase logs where magnet is off
-        regfiles[key] = reg.loc[reg['Current']>0.085]
+        kept = np.flatnonzero(reg['Current'].to_numpy()>0.085)
+        regfiles[key] = reg.take(kept)
         #Reset index and "Hours after Start" to start at 0
-        regfiles[key].reset_index(drop=True, inplace = True)
-        regfiles[key]["Hours"] = (regfiles[key]['Date/Time']-regfiles[key].iloc[0,0]).dt.total_seconds()/3600
+        regfiles[key].index = pd.RangeIndex(len(kept))
+        hours = reg['Hours'].to_numpy()[kept]
+        regfiles[key]["Hours"] = hours-hours[0]
     return regfiles
 
 
@@ -161,11 +298,60 @@ Reading and writing to database
 
 '''
 
+_CONN = None #Shared database connection, opened by get_conn()
+
+def get_conn():
+    '''
+    Returns the shared connection to the 107 database, opening it on first use
+    Reusing one connection keeps SQLite's page cache warm between writes and reads
+
+    Returns
+    -------
+    conn : sqlite3.Connection
+        Connection to cryo107.sqlite in WAL mode, with a memory-mapped, enlarged page cache
+
+    '''
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect('cryo107.sqlite', detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        _CONN.executescript('PRAGMA journal_mode=WAL; PRAGMA mmap_size=268435456; PRAGMA cache_size=-200000;')
+    return _CONN
+
+
+def _check_id_type(cur):
+    '''
+    Raises an error if the Cryo107 table was created before Id was stored as INTEGER seconds since the Unix epoch
+    Such databases hold Id as TEXT, which INTEGER time ranges silently fail to match
+
+    Parameters
+    ----------
+    cur : sqlite3.Cursor
+        Cursor of the 107 database
+
+    '''
+    for column in cur.execute('PRAGMA table_info(Cryo107)').fetchall():
+        if column[1] == 'Id' and column[2].upper() != 'INTEGER':
+            raise ValueError("Cryo107 table stores Id as {}, but Id is now stored as INTEGER seconds since the Unix epoch. Delete cryo107.sqlite (or drop the Cryo107 table) and re-import the logs with to_107db().".format(column[2]))
+
 
 def load_db(filepath):
     #Load relevant columns 107 log
-    log_filepath = r'{}'.format(filepath)
-    log_107 = pd.read_csv(log_filepath, usecols = [0,1,2,3,5,7,8,9,12,13,18], index_col = 0, skiprows = [1,2], na_filter=False, dtype = {"Note":str, "Hours after Start":np.float64, "50 mK FAA Temperature":np.float64, "3 K Stage Diode":np.float64, "Magnet Diode":np.float64, "Magnet Current":np.float64, "Power Supply Voltage":np.float64, "PID Setpoint":np.float64})
+    return _format_db_log(_read_107_columns(filepath), filepath)
+
+
+def _load_db_uncached(filepath):
+    '''
+    load_db() for to_107db() worker processes
+    Skips the read cache (it would keep every file a worker parses alive) and parses single-threaded (the pool already uses every core)
+    '''
+    return _format_db_log(_parse_107_columns(filepath, use_threads = False), filepath)
+
+
+def _format_db_log(log_107, filepath):
+    '''
+    Reorders and renames relevant columns of a 107 log for the database, indexed by date/time
+    '''
+    log_107 = log_107.set_index(log_107.columns[0])
     column_order = [1,2,3,5,6,4,9,7,8,0]
     column_names = ['Hours','50mK','He-3','3K','MagnetDiode','50K','Setpoint','Current','Voltage','Notes']
     log_107 = log_107[[log_107.columns[i] for i in column_order]]
@@ -175,48 +361,186 @@ def load_db(filepath):
     return log_107
 
 
-def to_107db(filelist):
-    conn = sqlite3.connect('cryo107.sqlite', detect_types=sqlite3.PARSE_DECLTYPES)
+def _insert_db_log(cur, log):
+    '''
+    Inserts a log returned by load_db() into the Cryo107 table
+    '''
+    #Store date/time as seconds since the Unix epoch
+    log.index = log.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+    cur.executemany('INSERT INTO Cryo107 ("Id", "Hours", "50mK", "He-3", "3K", "MagnetDiode", "50K", "Setpoint", "Current", "Voltage", "Notes", "Filepath") VALUES (?,?,?,?,?,?,?,?,?,?,?,?)', log.itertuples(index = True, name = None))
+
+
+def to_107db(filelist, workers = None):
+    '''
+    Writes 107 logs to the Cryo107 table of the 107 database, all in one transaction
+
+    Parameters
+    ----------
+    filelist : list of str
+        Filepaths of 107 logs (.csv files)
+    workers : int, optional
+        Number of worker processes parsing logs in parallel; only this process writes to the database.
+        The default is None, which parses the logs one after another in this process.
+        Workers are started with the "spawn" method, so a script using them must call to_107db() under if __name__ == '__main__':
+
+    '''
+    conn = get_conn()
     cur = conn.cursor()
-    for file in filelist:
-        print(file)
-        log = load_db(file)
-        log.index = log.index.map(lambda x: '{year}-{month}-{day} {hour}:{minute}:{sec}'.format(year = x[6:10], month = x[0:2], day = x[3:5], hour = x[11:13], minute = x[14:16], sec = x[17:]))
-        log.to_sql('Cryo107', conn, index_label = 'Id', if_exists = 'append', chunksize = 10000)
-    cur.close()
+    #Bulk import settings: keep temp tables in memory, don't wait on disk syncs
+    #The sync setting can't change inside a transaction, so it is left alone if the caller has one open on the shared connection
+    synchronous = cur.execute('PRAGMA synchronous').fetchone()[0]
+    temp_store = cur.execute('PRAGMA temp_store').fetchone()[0]
+    change_synchronous = not conn.in_transaction
+    if change_synchronous:
+        cur.execute('PRAGMA synchronous=OFF')
+    cur.execute('PRAGMA temp_store=MEMORY')
+    #Insert all files in a single savepoint: committed on release, unless the caller has a transaction open
+    cur.execute('SAVEPOINT to_107db')
+    try:
+        cur.execute('CREATE TABLE IF NOT EXISTS "Cryo107" ("Id" INTEGER, "Hours" REAL, "50mK" REAL, "He-3" REAL, "3K" REAL, "MagnetDiode" REAL, "50K" REAL, "Setpoint" REAL, "Current" REAL, "Voltage" REAL, "Notes" TEXT, "Filepath" TEXT)')
+        cur.execute('CREATE INDEX IF NOT EXISTS "ix_Cryo107_Id" ON "Cryo107" ("Id")')
+        _check_id_type(cur)
+        if workers is None:
+            for file in filelist:
+                print(file)
+                _insert_db_log(cur, load_db(file))
+        else:
+            #Parse files in parallel worker processes, only this process writes to the database
+            #At most one parsed file per worker waits to be inserted, which bounds memory use
+            #Spawned workers start fresh instead of inheriting this process's database connection
+            executor = ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn'))
+            try:
+                files = iter(filelist)
+                pending = deque((file, executor.submit(_load_db_uncached, file)) for file in itertools.islice(files, workers))
+                while pending:
+                    file, parsed = pending.popleft()
+                    next_file = next(files, None)
+                    if next_file is not None:
+                        pending.append((next_file, executor.submit(_load_db_uncached, next_file)))
+                    print(file)
+                    _insert_db_log(cur, parsed.result())
+            finally:
+                #Don't wait for queued files to be parsed if inserting failed
+                executor.shutdown(cancel_futures = True)
+        cur.execute('RELEASE to_107db')
+    except BaseException:
+        #Discard partially inserted files, the shared connection outlives this call
+        cur.execute('ROLLBACK TO to_107db')
+        cur.execute('RELEASE to_107db')
+        raise
+    finally:
+        #Restore the previous settings of the shared connection
+        if change_synchronous:
+            cur.execute('PRAGMA synchronous={}'.format(synchronous))
+        cur.execute('PRAGMA temp_store={}'.format(temp_store))
+        cur.close()
 
 
 def read_107db(starttime, endtime):
-    conn = sqlite3.connect('cryo107.sqlite', detect_types=sqlite3.PARSE_DECLTYPES)
+    '''
+    Reads the rows of the Cryo107 table logged strictly between two times
+
+    Parameters
+    ----------
+    starttime : str
+        Start of the time range (exclusive). Must be a timestamp pandas can parse, e.g. '2019-11-01 17:08:50'
+    endtime : str
+        End of the time range (exclusive), in the same format as starttime
+
+    Returns
+    -------
+    dataDF : DataFrame
+        Rows in the time range ordered by time, with the columns of the Cryo107 table
+
+    '''
+    conn = get_conn()
     #dataDF = pd.read_sql("SELECT * FROM Cryo107 WHERE Id > :start and Id < :end", conn, params = {'start':starttime, 'end':endtime}, parse_dates = {'Id': {'format':'%Y-%m-%d %H:%M:%S'}})
 
     cur = conn.cursor()
-    cur.execute("SELECT * FROM Cryo107 WHERE Id > ? AND Id < ? ORDER BY Id", (starttime, endtime))
-    data = cur.fetchall()
-    dataDF = pd.DataFrame(data, columns = ['Date/Time','Hours','50mK','He-3','3K','MagnetDiode','50K','Setpoint','Current','Voltage','Notes', 'Filepath'])
-    dataDF["Date/Time"] = pd.to_datetime(dataDF["Date/Time"], format = '%Y-%m-%d %H:%M:%S', errors = 'coerce')
+    _check_id_type(cur)
+    #Convert start and end times to seconds since the Unix epoch to match the Id column
+    bounds = (pd.Timestamp(starttime).timestamp(), pd.Timestamp(endtime).timestamp())
+
+    #Count and read rows in one read transaction, so both queries see the same snapshot of the database
+    #A savepoint nests inside any transaction the caller has open on the shared connection instead of committing it
+    cur.execute('SAVEPOINT read_107db')
+    try:
+        #Count rows in range so every column can be allocated up front
+        cur.execute("SELECT COUNT(*) FROM Cryo107 WHERE Id > ? AND Id < ?", bounds)
+        nrows = cur.fetchone()[0]
+        columns = ['Date/Time','Hours','50mK','He-3','3K','MagnetDiode','50K','Setpoint','Current','Voltage','Notes', 'Filepath']
+        data = {column:np.empty(nrows, dtype = np.float64) for column in columns[1:10]}
+        data['Date/Time'] = np.empty(nrows, dtype = np.int64)
+        data['Notes'] = np.empty(nrows, dtype = object)
+        data['Filepath'] = np.empty(nrows, dtype = object)
+
+        #Stream rows into the columns in batches rather than fetching one list of all rows
+        cur.arraysize = 10000
+        cur.execute("SELECT * FROM Cryo107 WHERE Id > ? AND Id < ? ORDER BY Id", bounds)
+        row = 0
+        rows = cur.fetchmany()
+        while rows:
+            for column, values in zip(columns, zip(*rows)):
+                data[column][row:row+len(rows)] = values
+            row += len(rows)
+            rows = cur.fetchmany()
+    finally:
+        cur.execute('RELEASE read_107db')
+    #Trim the columns to the rows actually read
+    data = {column:values[:row] for column, values in data.items()}
+    dataDF = pd.DataFrame(data, columns = columns, copy = False)
+    dataDF["Date/Time"] = pd.to_datetime(dataDF["Date/Time"], unit = 's')
+    #Only a few distinct filepaths and notes repeat over many rows, so store them as categories
+    dataDF["Notes"] = dataDF["Notes"].astype('category')
+    dataDF["Filepath"] = dataDF["Filepath"].astype('category')
     cur.close()
     return dataDF
 
+def _reaches_room_and_4K(temps):
+    '''
+    Checks if a phase log passes through both room temperature (284 to 286 K) and 4 K (3.5 to 4.5 K)
+
+    Parameters
+    ----------
+    temps : ndarray
+        50 mK FAA temperatures of the phase log
+
+    Returns
+    -------
+    bool
+        True if the phase may be a cooldown or warmup
+
+    '''
+    return bool(((temps>=284) & (temps<=286)).any() and ((temps>=3.5) & (temps<=4.5)).any())
+
+
 def split_db(df):
 
+    #An empty range of the database has no phases
+    if len(df) == 0:
+        return ({}, {}, {})
+
     #Create a list of indicies where cooldowns, warmups, regen cycles, and temperature holds may start
-    regen_bool = df['Notes'].map(lambda x:'Start Mag Cycle' in x).to_list()
-    reg_bool = df['Notes'].map(lambda x:'Mag Cycle complete' in x or 'Mag Cycle Canceled' in x).to_list()
+    regen_bool = _notes_contain(df['Notes'], 'Start Mag Cycle')
+    reg_bool = _notes_contain(df['Notes'], 'Mag Cycle complete', 'Mag Cycle Canceled')
+
+    #Compare integer category codes of neighboring rows to find where the filepath changes
+    filepath_codes = df['Filepath'].astype('category').cat.codes.to_numpy()
+    log_bool = (filepath_codes[:-1] != filepath_codes[1:])
 
-    filepaths = df['Filepath'].to_numpy(dtype = str)
-    log_bool = (filepaths[:-1] != filepaths[1:])
+    log_indicies = np.flatnonzero(log_bool).tolist()
+    regen_indicies = df.index[regen_bool].to_numpy()
+    reg_indicies = df.index[reg_bool].to_numpy()
 
-    log_indicies = np.where(log_bool)[0].tolist()
-    regen_indicies = df.index[regen_bool].to_list()
-    reg_indicies = df.index[reg_bool].to_list()
+    #Sorted array of all distinct phase boundaries
+    indicies = np.unique(np.concatenate([np.asarray(log_indicies, dtype=np.int64), np.asarray(regen_indicies, dtype=np.int64), np.asarray(reg_indicies, dtype=np.int64), np.array([0,len(df.index)], dtype=np.int64)]))
 
-    indicies = []
-    indicies.extend(log_indicies)
-    indicies.extend(regen_indicies)
-    indicies.extend(reg_indicies)
-    indicies.extend([0,len(df.index)])
-    indicies.sort()
+    #Extract temperatures, magnet current and timestamps as arrays for checking phases
+    temps = df['50mK'].to_numpy(dtype=np.float64)
+    current = df['Current'].to_numpy(dtype=np.float64)
+    times = df['Date/Time'].to_numpy()
+    #Hours elapsed since the start of the DF, used to reset "Hours from Start" for each phase
+    hours = (times-times[0])/np.timedelta64(1,'h')
 
 
 
@@ -229,64 +553,65 @@ def split_db(df):
     #Cooldowns may occur at the very beginning of the DF or right after the filepath name changes
     #Warmups may occur at the very end of the DF or right before the filepath name changes
 
-    #Extract phase at the beginning and end of the DF
-    firstlog = df.iloc[indicies[0]:indicies[1],:].reset_index(drop=True)
-    lastlog = df.iloc[indicies[-2]:indicies[-1],:].reset_index(drop=True)
+    #Phase logs are only extracted from the DF once they pass the check
 
     #Check if phase at beginning is a cooldown
-    if firstlog['50mK'].between(284,286).any() and firstlog['50mK'].between(3.5,4.5).any():
+    if _reaches_room_and_4K(temps[indicies[0]:indicies[1]]):
         cool_count += 1
-        coolwarmfiles['cooldown{}'.format(cool_count)]=firstlog
+        coolwarmfiles['cooldown{}'.format(cool_count)]=df.iloc[indicies[0]:indicies[1],:].reset_index(drop=True)
 
     #Check phases before and after the filepath name changes. Add to dictionary if condition is met
     for x in range(len(log_indicies)):
-        coollog = df.iloc[log_indicies[x]+1:indicies[indicies.index(log_indicies[x])+1],:].reset_index(drop=True)
-        warmlog = df.iloc[indicies[indicies.index(log_indicies[x])-1]:log_indicies[x],:].reset_index(drop=True)
-        if coollog['50mK'].between(284,286).any() and coollog['50mK'].between(3.5,4.5).any():
+        cool_start, cool_stop = log_indicies[x]+1, indicies[np.searchsorted(indicies, log_indicies[x], side='right')]
+        warm_start, warm_stop = indicies[np.searchsorted(indicies, log_indicies[x])-1], log_indicies[x]
+        if _reaches_room_and_4K(temps[cool_start:cool_stop]):
             cool_count += 1
-            coolwarmfiles['cooldown{}'.format(cool_count)]=coollog
-        if warmlog['50mK'].between(284,286).any() and warmlog['50mK'].between(3.5,4.5).any():
+            coolwarmfiles['cooldown{}'.format(cool_count)]=df.iloc[cool_start:cool_stop,:].reset_index(drop=True)
+        if _reaches_room_and_4K(temps[warm_start:warm_stop]):
             warm_count += 1
-            coolwarmfiles['warmup{}'.format(warm_count)]=warmlog
+            coolwarmfiles['warmup{}'.format(warm_count)]=df.iloc[warm_start:warm_stop,:].reset_index(drop=True)
 
     #Check if phase at end is a warmup
-    if lastlog['50mK'].between(284,286).any() and lastlog['50mK'].between(3.5,4.5).any():
+    if _reaches_room_and_4K(temps[indicies[-2]:indicies[-1]]):
         warm_count += 1
-        coolwarmfiles['warmup{}'.format(warm_count)]=lastlog
+        coolwarmfiles['warmup{}'.format(warm_count)]=df.iloc[indicies[-2]:indicies[-1],:].reset_index(drop=True)
 
 
 
 
     #Create a dictionary storing regen logs
 
+    #Find the next phase boundary after each ADR cycle start
+    regen_stops = indicies[np.searchsorted(indicies, regen_indicies, side='right')]
     regenfiles = {} #Initialize dictionary
     regen_count = 0 #Counter variable for naming dictionary keys
-    for x in range(len(regen_indicies)):
-        #Check if magnet turns on (current reaches above 15 A) and if magnet cycle lasts appropriate length of time (between 3 to 5 hours)
-        regenlog = df.iloc[regen_indicies[x]:indicies[indicies.index(regen_indicies[x])+1],:].reset_index(drop=True)
-        if regenlog['Current'].map(lambda x:x>15).any() and 3<((regenlog.iloc[-1,0]-regenlog.iloc[0,0]).total_seconds()/3600)<5:
-            regen_count += 1
-            #Add regen log to dictionary and reset index
-            regenfiles['regen{}'.format(regen_count)]= regenlog
-            #Reset "Hours from Start" column
-            regenfiles['regen{}'.format(regen_count)]["Hours"] = (regenfiles['regen{}'.format(regen_count)]['Date/Time']-regenfiles['regen{}'.format(regen_count)].iloc[0,0]).dt.total_seconds()/3600
+    #Check all regen phases at once, then extract the ones that pass
+    regen_kept = _check_regens(current, regen_indicies, regen_stops, hours[regen_stops-1]-hours[regen_indicies])
+    for start, stop in zip(regen_indicies[regen_kept], regen_stops[regen_kept]):
+        regen_count += 1
+        #Add regen log to dictionary and reset index
+        regenfiles['regen{}'.format(regen_count)]= df.iloc[start:stop,:].reset_index(drop=True)
+        #Reset "Hours from Start" column
+        regenfiles['regen{}'.format(regen_count)]["Hours"] = hours[start:stop]-hours[start]
 
 
     #Create a dictionary storing reg logs
 
+    #Find the next phase boundary after each ADR cycle completion
+    reg_stops = indicies[np.searchsorted(indicies, reg_indicies, side='right')]
     regfiles = {} #Initialize dictionary
     reg_count = 0 #Counter variable for naming dictionary keys
-    for x in range(len(reg_indicies)):
-        reglog = df.iloc[reg_indicies[x]:indicies[indicies.index(reg_indicies[x])+1],:].reset_index(drop=True)
-        #Check if magnet current is reasonable (above 0.1 A and below 2 A)
-        if not reglog.iloc[:,8].map(lambda x:x<0.1).all() and not reglog.iloc[:,8].map(lambda x:x>2).any():
-            reg_count += 1
-            #Add reg log to dictionary and reset index
-            regfiles['reg{}'.format(reg_count)]=reglog
-            #Reset "Hours from Start" column
-            regfiles['reg{}'.format(reg_count)]["Hours"] = (regfiles['reg{}'.format(reg_count)]['Date/Time']-regfiles['reg{}'.format(reg_count)].iloc[0,0]).dt.total_seconds()/3600
-            #Replace 0 values in "50 mK FAA" column with NaN
-            regfiles['reg{}'.format(reg_count)]['50mK'].replace(0,np.nan,inplace=True)
+    #Check all reg phases at once, then extract the ones that pass
+    reg_kept = _check_regs(current, reg_indicies, reg_stops)
+    for start, stop in zip(reg_indicies[reg_kept], reg_stops[reg_kept]):
+        reg_count += 1
+        #Add reg log to dictionary and reset index
+        regfiles['reg{}'.format(reg_count)]=df.iloc[start:stop,:].reset_index(drop=True)
+        #Reset "Hours from Start" column
+        regfiles['reg{}'.format(reg_count)]["Hours"] = hours[start:stop]-hours[start]
+        #Replace 0 values in "50 mK FAA" column with NaN
+        temp_50mK = regfiles['reg{}'.format(reg_count)]['50mK'].to_numpy()
+        regfiles['reg{}'.format(reg_count)]['50mK'] = np.where(temp_50mK==0, np.nan, temp_50mK)
 
     #Filter warmup data from temperature holds
     regfiles = temphold_filter(regfiles)
@@ -325,7 +650,7 @@ With date/time parsing: 6.5 s
 
 '''
 t1 = time.perf_counter()
-df = read_107db('2019-11-00 17:08:50', '2020-11-00 17:08:50')
+df = read_107db('2019-11-01 17:08:50', '2020-11-01 17:08:50')
 t2 = time.perf_counter()
 time3 = t2 - t1
 '''